@@ -4,3 +4,6 @@ class cfg:
     host = "mps.local"  # Change to IP if needed
     port = 5554
     recv_timeout_ms = 500
+    max_connect_attempts = 3
+    connect_retry_delay_s = 0.5
+    connect_retry_max_delay_s = 5.0
@@ -115,3 +115,8 @@ DATA_POINT_MAPPING = {
     '0x6003': {'name': 'T shim shunt', 'group': 'System', 'type': 'EB_TYPE_DOUBLE'},
     '0x2100': {'name': 'DPID_OC_TIMEOUT_MS', 'group': 'System', 'type': 'EB_TYPE_UINT32'}
 }
+
+# Datapoint names keyed by integer id, derived once from the static mapping above
+DATA_POINT_NAMES = {
+    int(point, 16): info["name"] for point, info in DATA_POINT_MAPPING.items() if "name" in info
+}
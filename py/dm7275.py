@@ -7,15 +7,21 @@ DM7275 Interface Module
 - Or imported as a library to control the Hioki DM7275
 """
 
+from __future__ import annotations
+
+import asyncio
 import time
-import math
 import sys
+import weakref
 from datetime import datetime
-import serial
-from serial.tools import list_ports
+from typing import TYPE_CHECKING
+
+# pyserial is imported lazily in the functions that open or enumerate ports
+if TYPE_CHECKING:
+    import serial
 
 # === PUBLIC API ===
-__all__ = ["open_port", "setup_device", "read_voltage", "connect_dm7275", "scpi_query", "scpi_write"]
+__all__ = ["open_port", "setup_device", "read_voltage", "read_voltage_async", "connect_dm7275", "scpi_query", "scpi_write"]
 
 # === CONFIG ===
 PORT_DEFAULT = "/dev/ttyACM0"
@@ -23,9 +29,17 @@ BAUD_DEFAULT = 9600
 TIMEOUT_S = 2.0
 TERM = b"\r\n"
 DISPLAY_MODE = "dynamic"  # "normal" or "dynamic"
+ERR_POLL_EVERY = 10  # polls between :SYST:ERR? checks in the CLI loop
+INVALID_LIMIT = 1e30  # readings at or beyond this magnitude are instrument markers, not values
+MAX_BAD_READS = 2  # unparsable :READ? replies in a row before the input buffer is flushed
+
+_consecutive_bad = 0
+# bytes read past the end of a reply, per open port, handed to the next scpi_query()
+_rx_carry: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
 # === CORE SERIAL HELPERS ===
 def open_port(port, baud=BAUD_DEFAULT, timeout=TIMEOUT_S):
+    import serial
     ser = serial.Serial(
         port=port, baudrate=baud,
         timeout=timeout, write_timeout=timeout,
@@ -44,24 +58,64 @@ def scpi_write(ser, cmd: bytes):
     ser.flush()
 
 def scpi_query(ser, cmd: bytes) -> str:
-    ser.reset_input_buffer()
-    ser.reset_output_buffer()
+    # no buffer resets before the query: the device only answers queries, so the input buffer
+    # is normally empty; it is flushed after a timed-out or empty reply and when replies stop parsing
     ser.write(cmd + TERM)
     ser.flush()
-    line = ser.readline()
-    return line.decode(errors="ignore").strip()
+    line = _read_line(ser)
+    reply = line.decode(errors="ignore").strip() if line is not None else ""
+    if not reply:
+        # timed out or empty: a late reply would answer the next query and every reading after
+        # it would be one poll stale, so resync right away
+        _reset_input(ser)
+    return reply
+
+def _read_line(ser) -> bytes | None:
+    """Return one reply up to its LF, keeping any bytes read past it; None on timeout."""
+    # read whatever the driver already has instead of readline()'s one read(1) call per byte
+    buf = _rx_carry.pop(ser, b"")
+    while b"\n" not in buf:
+        chunk = ser.read(max(1, ser.in_waiting))
+        if not chunk:
+            return None  # timeout; a partial reply is of no use
+        buf += chunk
+    line, rest = buf.split(b"\n", 1)
+    if rest:
+        _rx_carry[ser] = rest
+    return line
+
+def _reset_input(ser):
+    """Drop everything received so far, including bytes carried over from the last reply."""
+    global _consecutive_bad
+    ser.reset_input_buffer()
+    _rx_carry.pop(ser, None)
+    _consecutive_bad = 0
+
+def scpi_query_multi(ser, cmds: list[bytes]) -> list[str]:
+    """Send several queries as one compound message and return one response per query.
+
+    SCPI answers a compound query with a single line whose parts are separated by ';'.
+    Missing parts come back as empty strings.
+    """
+    resp = scpi_query(ser, b";".join(cmds))
+    parts = resp.split(";", len(cmds) - 1)
+    parts += [""] * (len(cmds) - len(parts))
+    return [p.strip() for p in parts]
 
 def parse_float_or_none(s: str):
     try:
         v = float(s)
-        if math.isfinite(v) and abs(v) < 1e30 and abs(v) != 9.91e37:
-            return v
     except Exception:
-        pass
+        return None
+    # one chained comparison rejects NaN, +/-inf and the SCPI overflow/invalid marker (+/-9.91e37)
+    if -INVALID_LIMIT < v < INVALID_LIMIT:
+        return v
     return None
 
 def read_error_if_any(ser):
-    resp = scpi_query(ser, b":SYST:ERR?")
+    return _error_or_none(scpi_query(ser, b":SYST:ERR?"))
+
+def _error_or_none(resp: str):
     if not resp:
         return None
     try:
@@ -99,8 +153,27 @@ def setup_device(ser, rng="AUTO"):
 # === PUBLIC WRAPPER ===
 def read_voltage(ser) -> float:
     """Returns one voltage reading as float (or None)."""
-    resp = scpi_query(ser, b":READ?")
-    return parse_float_or_none(resp)
+    return _track_reading(ser, parse_float_or_none(scpi_query(ser, b":READ?")))
+
+def read_voltage_and_error(ser):
+    """Return (voltage or None, error string or None) from a single :READ?;:SYST:ERR? round trip."""
+    resp_voltage, resp_error = scpi_query_multi(ser, [b":READ?", b":SYST:ERR?"])
+    return _track_reading(ser, parse_float_or_none(resp_voltage)), _error_or_none(resp_error)
+
+def _track_reading(ser, v):
+    global _consecutive_bad
+    if v is None:
+        _consecutive_bad += 1
+        if _consecutive_bad >= MAX_BAD_READS:
+            # probably out of step with the device (e.g. garbled replies)
+            _reset_input(ser)
+    else:
+        _consecutive_bad = 0
+    return v
+
+async def read_voltage_async(ser) -> float:
+    """Like read_voltage(), but runs the blocking serial query in a worker thread."""
+    return await asyncio.to_thread(read_voltage, ser)
 
 def connect_dm7275(port_hint=PORT_DEFAULT, rng="AUTO") -> serial.Serial:
     ser = open_port(port_hint)
@@ -109,6 +182,7 @@ def connect_dm7275(port_hint=PORT_DEFAULT, rng="AUTO") -> serial.Serial:
 
 # === OPTIONAL CLI / INTERACTIVE MODE ===
 def choose_port():
+    from serial.tools import list_ports
     ports = list(list_ports.comports())
     print("Available ports:")
     if not ports:
@@ -149,27 +223,47 @@ def main():
     print(f"\nPolling started: every {interval} s. Press Ctrl+C to stop.\n")
 
     try:
-        k = 0
-        while True:
-            ts = datetime.now().isoformat(timespec="seconds")
-            v = read_voltage(ser)
-            err = read_error_if_any(ser) if (k % 10 == 0) else None
-            out = f"{ts}  V={v:.8f}" if v is not None else f"{ts}  V=<no response>"
-            if err:
-                out += f"  ERR={err}"
-
-            if DISPLAY_MODE == "dynamic":
-                sys.stdout.write("\r" + out + " " * 10)
-                sys.stdout.flush()
-            else:
-                print(out)
-
-            k += 1
-            time.sleep(interval)
+        asyncio.run(poll_voltage(ser, interval))
     except KeyboardInterrupt:
         print("\nStopped by user.")
     finally:
         ser.close()
 
+# status line templates for poll_voltage(), formatted as bytes and written to the binary stdout
+_ROW = b"%b  V=%.8f"
+_ROW_NO_RESPONSE = b"%b  V=<no response>"
+_ROW_ERR = b"  ERR=%b"
+_PAD = b" " * 10
+
+async def poll_voltage(ser, interval):
+    """Print a reading every `interval` seconds without blocking the event loop on serial I/O."""
+    if DISPLAY_MODE == "dynamic":
+        prefix, suffix = b"\r", _PAD
+    else:
+        prefix, suffix = b"", b"\n"
+    sys.stdout.flush()  # keep earlier text-layer output ahead of the binary writes
+    out_buffer = sys.stdout.buffer
+    err_countdown = 1  # check for instrument errors on the first poll and every ERR_POLL_EVERY after
+    ts_second = None  # the timestamp only changes once per second, so reformat it only then
+    while True:
+        now_s = int(time.time())
+        if now_s != ts_second:
+            ts_second = now_s
+            ts = datetime.fromtimestamp(now_s).isoformat(timespec="seconds").encode()
+        err_countdown -= 1
+        if err_countdown == 0:
+            err_countdown = ERR_POLL_EVERY
+            v, err = await asyncio.to_thread(read_voltage_and_error, ser)
+        else:
+            v, err = await read_voltage_async(ser), None
+        out = _ROW % (ts, v) if v is not None else _ROW_NO_RESPONSE % ts
+        if err:
+            out += _ROW_ERR % err.encode(errors="replace")
+
+        out_buffer.write(prefix + out + suffix)
+        out_buffer.flush()
+
+        await asyncio.sleep(interval)
+
 if __name__ == "__main__":
     main()
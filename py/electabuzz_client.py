@@ -1,13 +1,17 @@
 import ctypes as ct
 import asyncio
+import collections
 from threading import Lock
 import logging
-import asyncudp
-import msgpack
 import socket
 import sys
 import struct
+import time
 from enum import Enum
+from typing import Collection
+
+# msgpack is imported when the first Client is created so that importing this module (e.g. for
+# the EB_TYPE_* constants or EbResult) stays cheap for tools that never talk to the device
 
 EB_TYPE_NIL = 0x00
 EB_TYPE_BOOL = 0x01
@@ -25,6 +29,13 @@ EB_TYPE_STR = 0x0c
 EB_TYPE_BIN = 0x0d
 EB_TYPE_UNKOWN = 0xFF
 
+# packet header: version, transaction id, packet type, payload length
+_HDR_STRUCT = struct.Struct(">HHHH")
+
+# resolved remote addresses keyed by (hostname, port): (expiry time, sockaddr)
+_ADDR_CACHE: dict[tuple[str, int], tuple[float, tuple]] = {}
+_ADDR_CACHE_TTL_S = 60.0
+
 
 class EbPacketType(Enum):
     EB_MT_PROCESSING_ERR = 0x0000
@@ -63,21 +74,57 @@ class EbResult(Enum):
     EB_ERR_CONNECTION = 0xF000
 
 
-eb_result_dict = {
-    0x0000: "EB_OK",
-    0x0001: "EB_ERR_NOT_FOUND",
-    0x0004: "EB_ERR_OTHER",
-    0x0005: "EB_ERR_NOT_UNIQUE",
-    0x0006: "EB_ERR_NOT_IMPLEMENTED",
-    0x0007: "EB_ERR_WRONG_PARAMETER",
-    0x0008: "EB_ERR_NO_MEMORY",
-    0x0009: "EB_ERR_INTERNAL_ERR",
-    0x000A: "EB_ERR_MSG_FORMAT",
-    0x000B: "EB_ERR_OVERFLOW",
-    0x000C: "EB_ERR_TYPE",
-    0x000D: "EB_ERR_CALLBACK",
-    0x000E: "EB_ERR_READ_ONLY",
-    0x000F: "EB_ERR_LENGTH_MISMATCH", }
+# Enum-by-value calls go through EnumMeta.__call__; a plain dict is much cheaper in the decode loops
+_EB_RESULT_BY_VALUE = {m.value: m for m in EbResult}
+_EB_NAME_BY_VALUE = {m.value: m.name for m in EbResult}
+_EB_OK_VALUE = EbResult.EB_OK.value
+_EB_PACKET_TYPE_BY_VALUE = {m.value: m for m in EbPacketType}
+
+# decoded response packet; the payload is a memoryview into the received datagram
+_EbPacket = collections.namedtuple("_EbPacket", "version transaction_id type payload")
+
+
+async def _resolve(hostname: str, port: int) -> tuple:
+    """Return the UDP sockaddr for hostname:port, reusing recent lookups on reconnect."""
+    key = (hostname, port)
+    now = time.monotonic()
+    cached = _ADDR_CACHE.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    loop = asyncio.get_running_loop()
+    addr_info = await loop.getaddrinfo(hostname, port, type=socket.SOCK_DGRAM)
+    remote_addr = addr_info[0][4]
+    _ADDR_CACHE[key] = (now + _ADDR_CACHE_TTL_S, remote_addr)
+    return remote_addr
+
+
+class _EbDatagramProtocol(asyncio.DatagramProtocol):
+    """Queue datagrams from a connected UDP endpoint for Client._tx_rx."""
+
+    def __init__(self):
+        self._rx_queue = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr):
+        self._rx_queue.put_nowait(data)
+
+    def error_received(self, exc: Exception):
+        # e.g. ICMP port unreachable -> ConnectionRefusedError, raised to the waiting receiver
+        self._rx_queue.put_nowait(exc)
+
+    async def recv(self) -> bytes:
+        data = await self._rx_queue.get()
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+    def recv_nowait(self) -> bytes | None:
+        """Return an already queued datagram, or None if nothing is pending."""
+        if self._rx_queue.empty():
+            return None
+        data = self._rx_queue.get_nowait()
+        if isinstance(data, Exception):
+            raise data
+        return data
 
 
 class Client:
@@ -86,18 +133,26 @@ class Client:
         self.transaction_id = 0
         self.url = ""
         self.tx_rx_lock = asyncio.Lock()
+        import msgpack
+        # packers are stateless between calls (autoreset), so build them once per client
+        self._packer = msgpack.Packer()
+        self._packer_single_float = msgpack.Packer(use_single_float=True)
+        # kept on the client so the decode paths need no import statement or module lookup
+        self._unpacker_type = msgpack.Unpacker
+        self._out_of_data = msgpack.OutOfData
 
     def set_verbose(self, v: bool):
         self.verbose = v
 
     async def connect(self, hostname: str, port: int = 5554, recv_timeout_ms=500):
         loop = asyncio.get_running_loop()
-        addr_info = await loop.getaddrinfo(hostname, port, type=socket.SOCK_DGRAM)
-        remote_addr = addr_info[0][4]
+        remote_addr = await _resolve(hostname, port)
         if self.verbose:
             print(f"connecting to {remote_addr}")
-        self.sock = await asyncudp.create_socket(remote_addr=remote_addr)  # local_addr=('127.0.0.1', 9999),
-        self.ip = addr_info[0]
+        # connected UDP endpoint: sendto() goes straight to send() without a per-datagram route lookup
+        self._transport, self._protocol = await loop.create_datagram_endpoint(
+            _EbDatagramProtocol, remote_addr=remote_addr)
+        self.ip = remote_addr[0]
         self.port = port
         self.recv_timeout = recv_timeout_ms / 1000
         return 0
@@ -105,7 +160,7 @@ class Client:
     def close(self):
         if self.verbose:
             print("closing UDP socket")
-        return self.sock.close()
+        return self._transport.close()
 
     def _next_transaction_id(self):
         self.transaction_id += 1
@@ -113,26 +168,27 @@ class Client:
             self.transaction_id = 0
         return self.transaction_id
 
-    def _create_packet(self, type: EbPacketType, payload: bytes) -> bytes:
+    def _create_packet(self, type: EbPacketType, payload: bytes) -> bytearray:
         version = 0  # only support version 0
         payload_len = len(payload)
         self._next_transaction_id()
-        return struct.pack(">HHHH", version, self.transaction_id, type.value, payload_len) + payload
+        # build header and payload in a single buffer instead of concatenating two bytes objects
+        packet = bytearray(_HDR_STRUCT.size + payload_len)
+        _HDR_STRUCT.pack_into(packet, 0, version, self.transaction_id, type.value, payload_len)
+        packet[_HDR_STRUCT.size:] = payload
+        return packet
 
-    def _parse_packet(raw_packet: bytes) -> dict:
-        if len(raw_packet) < 8:
-            print(f"packet length ({len(packet)}) is shorter than header")
+    @staticmethod
+    def _parse_packet(raw_packet: bytes) -> _EbPacket | None:
+        if len(raw_packet) < _HDR_STRUCT.size:
+            print(f"packet length ({len(raw_packet)}) is shorter than header")
             return None
-        header = struct.unpack(">HHHH", raw_packet[0:8])
-        packet = {}
-        packet['version'] = header[0]
-        packet['transaction_id'] = header[1]
-        packet['type'] = EbPacketType(header[2])
+        version, transaction_id, packet_type, _payload_len = _HDR_STRUCT.unpack_from(raw_packet, 0)
         # TODO: check payload length
-        packet['payload'] = raw_packet[8:]
-        return packet
+        return _EbPacket(version, transaction_id, _EB_PACKET_TYPE_BY_VALUE[packet_type],
+                         memoryview(raw_packet)[_HDR_STRUCT.size:])  # avoid copying the payload
 
-    async def _tx_rx(self, tx_packet: bytes, response_type: EbPacketType, n_tries: int = 4) -> dict | EbResult:
+    async def _tx_rx(self, tx_packet: bytes, response_type: EbPacketType, n_tries: int = 4) -> _EbPacket | EbResult:
         result = None
         skip_tx = False
         verbose = self.verbose
@@ -142,13 +198,16 @@ class Client:
             if not skip_tx:
                 if self.verbose:
                     print(f"send message with id {self.transaction_id} to server: {tx_packet.hex(' ')}")
-                self.sock.sendto(tx_packet)
+                self._transport.sendto(tx_packet)
             skip_tx = False
             try:
                 if verbose:
                     print(f'try to receive UDP datagram')
-                async with asyncio.timeout(self.recv_timeout):
-                    response_bytes, addr = await self.sock.recvfrom()
+                # only arm a timer if the response is not already waiting in the queue
+                response_bytes = self._protocol.recv_nowait()
+                if response_bytes is None:
+                    async with asyncio.timeout(self.recv_timeout):
+                        response_bytes = await self._protocol.recv()
             except asyncio.TimeoutError:
                 if verbose:
                     print(f'UDP receive timeout ({self.recv_timeout})')
@@ -161,31 +220,34 @@ class Client:
                 continue
 
             if self.verbose:
-                print(f"received bytes {response_bytes.hex(' ')} from {addr}")
+                print(f"received bytes {response_bytes.hex(' ')}")
             eb_resp_packet = Client._parse_packet(response_bytes)
             if self.verbose:
                 print(f"received packet {eb_resp_packet}")
+            if eb_resp_packet is None:
+                result = EbResult.EB_ERR_MSG_FORMAT
+                continue
 
-            if eb_resp_packet['version'] != 0:
-                print(f"response has wrong version: {eb_resp_packet['version']}")
+            if eb_resp_packet.version != 0:
+                print(f"response has wrong version: {eb_resp_packet.version}")
                 result = EbResult.EB_ERR_MSG_FORMAT
                 continue
 
-            if eb_resp_packet['transaction_id'] != self.transaction_id:
+            if eb_resp_packet.transaction_id != self.transaction_id:
                 if verbose:
                     print(
-                        f"wrong transaction id, got {eb_resp_packet['transaction_id']} expected {self.transaction_id}")
+                        f"wrong transaction id, got {eb_resp_packet.transaction_id} expected {self.transaction_id}")
                 result = EbResult.EB_ERR_MSG_FORMAT
                 skip_tx = True  # maybe this was just a leftover or duplicate, ignore it
                 continue
 
-            if eb_resp_packet['type'] == EbPacketType.EB_MT_TIMEOUT:
+            if eb_resp_packet.type == EbPacketType.EB_MT_TIMEOUT:
                 if verbose:
                     print(f"Server reports a timeout")
                 result = EbResult.EB_ERR_TIMEOUT
                 continue
 
-            if eb_resp_packet['type'] != response_type:
+            if eb_resp_packet.type != response_type:
                 if verbose:
                     print(f"received message has wrong type")
                 result = EbResult.EB_ERR_MSG_FORMAT
@@ -194,16 +256,16 @@ class Client:
             return eb_resp_packet
         return result
 
-    async def multi_read(self, id_codes: list[int] | tuple[int]) -> dict[int, dict[str, object]] | None:
+    async def multi_read(self, id_codes: Collection[int]) -> dict[int, dict[str, object]] | None:
         async with self.tx_rx_lock:  # make sure only one request is transmitted at a time since the multiplexer can handle only
             # prepare the requests payload
-            packer = msgpack.Packer()
-            payload = bytes()
+            pack = self._packer.pack
+            payload = bytearray()
             for id in id_codes:
                 if id < 0 or id > 0xFFFF:
                     print(f"ID code {id} is not valid (out of range)")
                     return None
-                payload = payload + packer.pack(id)
+                payload += pack(id)  # in-place extend, no copy of the whole payload per id
             if self.verbose:
                 print(f"send read request with payload {payload.hex(' ')}")
 
@@ -211,31 +273,42 @@ class Client:
             eb_req_packet = self._create_packet(EbPacketType.EB_MT_READ_DATA_REQ, payload)
 
             eb_resp_packet = await self._tx_rx(eb_req_packet, EbPacketType.EB_MT_READ_DATA_RSP, 3)
-            if type(eb_resp_packet) == EbResult:
+            if isinstance(eb_resp_packet, EbResult):
                 print(f"could not get response: {eb_req_packet.hex(' ')}")
                 return None
 
             results = dict.fromkeys(id_codes)
-            unpacker = msgpack.Unpacker()
-            unpacker.feed(eb_resp_packet['payload'])
-            payload_len = len(eb_resp_packet['payload'])
-            while unpacker.tell() < payload_len:
-                dp_id = unpacker.unpack()
-                if type(dp_id) != int:
+            # decode the whole response in one pass: [id, code, (value if EB_OK), id, code, ...]
+            unpacker = self._unpacker_type()
+            unpacker.feed(eb_resp_packet.payload)
+            fields = list(unpacker)
+            n_fields = len(fields)
+            i = 0
+            while i < n_fields:
+                dp_id = fields[i]
+                if not isinstance(dp_id, int):
                     print(f"response format error: received ID code is not an int")
                     return None
                 if dp_id < 0 or dp_id > 0xFFFF:
                     print(f"response format error: id code {dp_id} is out of range")
                     return None
+                if i + 1 >= n_fields:
+                    print(f"response format error: missing result code for id code {dp_id}")
+                    return None
 
-                result_code = EbResult(unpacker.unpack())
+                code_int = fields[i + 1]
+                i += 2
 
                 result = {'data_point_id': dp_id,
-                          'result_code': result_code.value,
-                          'result_string': eb_result_dict[result_code.value],
+                          'result_code': code_int,
+                          'result_string': _EB_NAME_BY_VALUE.get(code_int, "UNKNOWN"),
                           'data_type': None}
-                if result_code == EbResult.EB_OK:
-                    value = unpacker.unpack()
+                if code_int == _EB_OK_VALUE:
+                    if i >= n_fields:
+                        print(f"response format error: missing value for id code {dp_id}")
+                        return None
+                    value = fields[i]
+                    i += 1
                     if type(value) is list:
                         result['num_elements'] = len(value)
                     else:
@@ -247,15 +320,45 @@ class Client:
             # TODO: check that there are no bytes left over
         return results
 
+    async def single_read(self, id_code: int) -> object | None:
+        # read a single data point and return only its value (None on any failure), skipping the
+        # per-id result dicts that multi_read builds
+        if (id_code < 0) or (id_code > 0xFFFF):
+            print(f"id_code {id_code} is not an uint16")
+            return None
+        async with self.tx_rx_lock:  # make sure only one request is transmitted at a time since the multiplexer can handle only
+            payload = self._packer.pack(id_code)
+            if self.verbose:
+                print(f"send read request with payload {payload.hex(' ')}")
+            eb_req_packet = self._create_packet(EbPacketType.EB_MT_READ_DATA_REQ, payload)
+            eb_resp_packet = await self._tx_rx(eb_req_packet, EbPacketType.EB_MT_READ_DATA_RSP, 3)
+        if isinstance(eb_resp_packet, EbResult):
+            print(f"could not get response: {eb_req_packet.hex(' ')}")
+            return None
+
+        unpacker = self._unpacker_type()
+        unpacker.feed(eb_resp_packet.payload)
+        try:
+            dp_id = unpacker.unpack()
+            if dp_id != id_code:
+                print(f"received read response for id {dp_id} but requested {id_code}")
+                return None
+            if unpacker.unpack() != _EB_OK_VALUE:
+                return None
+            return unpacker.unpack()
+        except self._out_of_data:
+            print(f"response format error: incomplete read response for id code {id_code}")
+            return None
+
     async def single_write(self, id_code: int, value, eb_type=None) -> EbResult | None:
         async with self.tx_rx_lock:  # make sure only one request is transmitted at a time since the multiplexer can handle only
             if (id_code < 0) or (id_code > 0xFFFF):
                 print(f"id_code {id_code} is not an uint16")
                 return EbResult.EB_ERR_WRONG_PARAMETER
-            use_single_float = False
             if eb_type == EB_TYPE_FLOAT:
-                use_single_float = True
-            packer = msgpack.Packer(use_single_float=use_single_float)
+                packer = self._packer_single_float
+            else:
+                packer = self._packer
             # make sure we send doubles if this is requested, the EB server does strict type checking
             if (eb_type == EB_TYPE_DOUBLE) or (eb_type == EB_TYPE_FLOAT):
                 if type(value) is list:
@@ -270,18 +373,18 @@ class Client:
             eb_req_packet = self._create_packet(EbPacketType.EB_MT_WRITE_DATA_REQ, payload)
 
             eb_resp_packet = await self._tx_rx(eb_req_packet, EbPacketType.EB_MT_WRITE_DATA_RSP, 3)
-            if type(eb_resp_packet) == EbResult:
+            if isinstance(eb_resp_packet, EbResult):
                 print(f"could not get response: {eb_req_packet}")
                 return None
             if self.verbose:
-                print(f"process write response payload for 0x{id_code:04x}: {eb_resp_packet['payload'].hex(' ')}")
-            unpacker = msgpack.Unpacker()
-            unpacker.feed(eb_resp_packet['payload'])
-            payload_len = len(eb_resp_packet['payload'])
+                print(f"process write response payload for 0x{id_code:04x}: {eb_resp_packet.payload.hex(' ')}")
+            unpacker = self._unpacker_type()
+            unpacker.feed(eb_resp_packet.payload)
+            payload_len = len(eb_resp_packet.payload)
             result_code = EbResult.EB_ERR_NOT_FOUND
             while unpacker.tell() < payload_len:
                 dp_id = unpacker.unpack()
-                if type(dp_id) != int:
+                if not isinstance(dp_id, int):
                     print(f"response format error: received ID code is not an int")
                     return EbResult.EB_ERR_MSG_FORMAT
                 if dp_id < 0 or dp_id > 0xFFFF:
@@ -291,19 +394,24 @@ class Client:
                     print(f"received write response for id {dp_id} but wrote {id_code}")
                     return EbResult.EB_ERR_MSG_FORMAT
                 # get the result code
-                result_code = EbResult(unpacker.unpack())
+                code_int = unpacker.unpack()
+                result_code = _EB_RESULT_BY_VALUE.get(code_int)
+                if result_code is None:
+                    print(f"response format error: {code_int!r} is not a valid EbResult")
+                    return EbResult.EB_ERR_MSG_FORMAT
             # TODO: check for leftover bytes
         return result_code
 
     async def get_connected_clients(self) -> tuple[EbResult, dict]:
-        eb_req_packet = self._create_packet(EbPacketType.EB_MT_CLIENTS_REQ, b'')
-        eb_resp_packet = await self._tx_rx(eb_req_packet, EbPacketType.EB_MT_CLIENTS_RSP, 3)
-        if type(eb_resp_packet) == EbResult:
+        async with self.tx_rx_lock:  # responses are matched to self.transaction_id, so never interleave requests
+            eb_req_packet = self._create_packet(EbPacketType.EB_MT_CLIENTS_REQ, b'')
+            eb_resp_packet = await self._tx_rx(eb_req_packet, EbPacketType.EB_MT_CLIENTS_RSP, 3)
+        if isinstance(eb_resp_packet, EbResult):
             print(f"could not get response: {eb_req_packet}")
-            return None
-        unpacker = msgpack.Unpacker(use_list=False, strict_map_key=False)
-        unpacker.feed(eb_resp_packet['payload'])
-        # payload_len = len(eb_resp_packet['payload'])
+            return eb_resp_packet, None
+        unpacker = self._unpacker_type(use_list=False, strict_map_key=False)
+        unpacker.feed(eb_resp_packet.payload)
+        # payload_len = len(eb_resp_packet.payload)
         result_code = EbResult.EB_OK
         clients = unpacker.unpack()
         # TODO: check for leftover bytes
@@ -370,17 +478,24 @@ async def a_main(read_only: bool = False):
         print(f'check server_and_mux.c in electabuzz-multiplexer repo')
         exit()
     error_count = 0
+    # the write decisions (1 in 10 per data point) are drawn for a whole block of iterations at once
+    # so the loop measures the network path rather than random.randrange
+    gate_block = 10000
+    int16_range = range(-32768, 32768)
     for i in range(0, 200000):
+        if i % gate_block == 0:
+            write_gates = random.choices((True, False), weights=(1, 9), k=3 * gate_block)
+        gate = 3 * (i % gate_block)
 
         try:
             if not read_only:
-                if (random.randrange(0, 10) % 10) == 0:
-                    uint32_value = random.randrange(0, 0xFFFFFFFF + 1)
+                if write_gates[gate]:
+                    uint32_value = random.getrandbits(32)
                     await write_uint32()
-                if (random.randrange(0, 10) % 10) == 0:
-                    int16_values = [random.randrange(-32768, 32768) for _ in range(0, 16)]
+                if write_gates[gate + 1]:
+                    int16_values = random.choices(int16_range, k=16)
                     await write_int16_array()
-                if (random.randrange(0, 10) % 10) == 0:
+                if write_gates[gate + 2]:
                     double_value = random.random()
                     await write_double()
 
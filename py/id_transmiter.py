@@ -3,18 +3,28 @@ import asyncio
 import electabuzz_client as ebc
 from constants import cfg
 from network_utils import connect_to_device
-from datapoint_mapping import DATA_POINT_MAPPING
-from electabuzz_client import *
-
-import readline, os, atexit
+from datapoint_mapping import DATA_POINT_MAPPING, DATA_POINT_NAMES
+from electabuzz_client import (
+    EB_TYPE_BOOL,
+    EB_TYPE_DOUBLE,
+    EB_TYPE_FLOAT,
+    EB_TYPE_INT32,
+    EB_TYPE_INT8,
+    EB_TYPE_UINT16,
+    EB_TYPE_UINT32,
+    EB_TYPE_UNKOWN,
+)
+
+import readline, os, atexit, functools
 
 HISTORY_FILE = os.path.expanduser("~/.id_transmiter_history")
-if os.path.exists(HISTORY_FILE):
-    readline.read_history_file(HISTORY_FILE)
-atexit.register(lambda: readline.write_history_file(HISTORY_FILE))
 
 COMMANDS = ['r', 'w', 'exit']
 POINTS = list(DATA_POINT_MAPPING.keys())
+# completion label for every datapoint, e.g. "1000 [Filtered Module Currents]"
+POINT_LABELS = {
+    pt: f"{pt[2:]} [{info['name']}]" if 'name' in info else pt[2:] for pt, info in DATA_POINT_MAPPING.items()
+}
 
 
 def completer(text, state):
@@ -27,16 +37,20 @@ def completer(text, state):
     elif len(buffer) == 2 and buffer[0] in ('r', 'w'):
         prefix = f'0x{text.lower()}'
         matches = [pt for pt in POINTS if pt.startswith(prefix)]
-        options = [f"{pt[2:]} [{DATA_POINT_MAPPING[pt]['name']}]" if 'name' in DATA_POINT_MAPPING[pt] else pt[2:] for pt
-                   in matches]
+        options = [POINT_LABELS[pt] for pt in matches]
     try:
         return options[state]
     except IndexError:
         return None
 
 
-readline.set_completer(completer)
-readline.parse_and_bind('tab: complete')
+def setup_readline():
+    """Load the command history and install tab completion (only when run as the CLI)."""
+    if os.path.exists(HISTORY_FILE):
+        readline.read_history_file(HISTORY_FILE)
+    atexit.register(lambda: readline.write_history_file(HISTORY_FILE))
+    readline.set_completer(completer)
+    readline.parse_and_bind('tab: complete')
 
 TYPE_MAP = {
     'EB_TYPE_FLOAT': EB_TYPE_FLOAT,
@@ -50,6 +64,13 @@ TYPE_MAP = {
 }
 
 
+@functools.lru_cache(maxsize=512)
+def _resolve_type(dp_id: int) -> tuple[str, int]:
+    """Return (type name, EB type constant) for a datapoint, resolved once per id."""
+    type_str = DATA_POINT_MAPPING.get(f"0x{dp_id:04x}", {}).get("type", "EB_TYPE_FLOAT")
+    return type_str, TYPE_MAP.get(type_str, EB_TYPE_UNKOWN)
+
+
 async def read_point(client, hex_id):
     try:
         dp_id = int(hex_id, 16)
@@ -58,7 +79,7 @@ async def read_point(client, hex_id):
             print(f"❌ {hex_id} not found or no response.")
         else:
             dp_data = result[dp_id]
-            name = DATA_POINT_MAPPING.get(f"0x{dp_id:04x}", {}).get("name", "Unnamed")
+            name = DATA_POINT_NAMES.get(dp_id, "Unnamed")
             val = dp_data.get('value')
 
             # Apply formatting: if it's float, format to 5 decimals
@@ -77,9 +98,7 @@ async def read_point(client, hex_id):
 async def write_point(client, hex_id, values):
     try:
         dp_id = int(hex_id, 16)
-        point = f"0x{dp_id:04x}"
-        type_str = DATA_POINT_MAPPING.get(point, {}).get("type", "EB_TYPE_FLOAT")
-        eb_type = TYPE_MAP.get(type_str, EB_TYPE_UNKOWN)
+        type_str, eb_type = _resolve_type(dp_id)
 
         # 🟢 Proper type handling
         if type_str == 'EB_TYPE_BOOL':
@@ -126,6 +145,7 @@ async def cli_loop(client):
 
 
 async def main():
+    setup_readline()
     client = ebc.Client()
     if await connect_to_device(client, cfg.port):
         try:
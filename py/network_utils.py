@@ -1,28 +1,36 @@
-import time
+import asyncio
 import logging
 import electabuzz_client as ebc
 from constants import cfg
 
 
 async def connect_to_device(client : ebc.Client, port : int = 5554) -> bool:
-    max_connect_attempts = 3
+    # cfg is a plain, editable settings class: read it once per call, not per attempt
+    host = cfg.host
+    max_connect_attempts = cfg.max_connect_attempts
+    retry_delay = cfg.connect_retry_delay_s
+    max_delay = cfg.connect_retry_max_delay_s
     for attempt in range(max_connect_attempts):
+        if attempt > 0:
+            # back off exponentially so a controller that is down is not hammered
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, max_delay)
         try:
-            ret = await client.connect(hostname=cfg.host, port=port)
+            ret = await client.connect(hostname=host, port=port)
             if ret != 0:
-                print(f'Attempt {attempt + 1}: Failed to connect to {EB_HOST_NAME}')
-                logging.error(f'Attempt {attempt + 1}: Failed to connect to {EB_HOST_NAME}')
-                time.sleep(0.5)
+                print(f'Attempt {attempt + 1}: Failed to connect to {host}')
+                logging.error(f'Attempt {attempt + 1}: Failed to connect to {host}')
+                continue
             # send a request to the EB server to check the communication
             result_code, _ = await client.get_connected_clients()
             if result_code == ebc.EbResult.EB_OK:
                 return True
-            print(f'Attempt {attempt + 1}: Failed to communicate with {EB_HOST_NAME}: {result_code}')
-            logging.error(f'Attempt {attempt + 1}: Failed to communicate with {EB_HOST_NAME}: {result_code}')
+            print(f'Attempt {attempt + 1}: Failed to communicate with {host}: {result_code}')
+            logging.error(f'Attempt {attempt + 1}: Failed to communicate with {host}: {result_code}')
         except Exception as e:
-            print(f"Error connecting to {cfg.host}: {e}")
-            logging.error(f'Error connecting to {cfg.host}: {e}')
+            print(f"Error connecting to {host}: {e}")
+            logging.error(f'Error connecting to {host}: {e}')
     
-    print(f'Failed to connect to {EB_HOST_NAME} after {max_connect_attempts} attempts')
+    print(f'Failed to connect to {host} after {max_connect_attempts} attempts')
     return False
 
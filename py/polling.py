@@ -0,0 +1,53 @@
+"""Backoff polling and event loop helpers shared by the Worker A scripts."""
+import asyncio
+import signal
+import sys
+
+
+def install_event_loop_policy():
+    """Switches asyncio to the io_uring event loop (uringcore) on Linux when it is installed."""
+    if sys.platform.startswith("linux"):
+        try:
+            import uringcore  # optional io_uring event loop, falls back to the default loop
+            asyncio.set_event_loop_policy(uringcore.EventLoopPolicy())
+        except ImportError:
+            pass
+
+
+def add_stop_handler(callback):
+    """
+    Calls callback() on Ctrl+C. Must be called from a coroutine on the running loop.
+
+    The handler runs on the event loop thread; loops without signal support (e.g. on
+    Windows) fall back to a plain signal.signal() handler.
+    """
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGINT, callback)
+    except NotImplementedError:
+        signal.signal(signal.SIGINT, lambda signum, frame: callback())
+
+
+async def poll_until(read_fn, check, *, timeout: float, interval: float, initial_interval: float = 0.05):
+    """
+    Awaits read_fn() and hands each value to check(value, elapsed) until it decides.
+
+    check returns True (done), False (abort) or None (keep polling). The delay between
+    polls starts at initial_interval and doubles up to interval; the last poll happens
+    at the timeout. Returns the decision, or None if the timeout expired undecided.
+    """
+    sleep = asyncio.sleep
+    now = asyncio.get_running_loop().time
+    delay = min(initial_interval, interval)
+    start = now()
+
+    while True:
+        value = await read_fn()
+        elapsed = now() - start
+        decision = check(value, elapsed)
+        if decision is not None:
+            return decision
+        remaining = timeout - elapsed
+        if remaining <= 0:
+            return None
+        await sleep(delay if delay < remaining else remaining)
+        delay = min(delay * 2, interval)
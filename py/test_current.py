@@ -6,12 +6,13 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import signal
+import functools
 import sys
 from typing import Optional
 
 import electabuzz_client as ebc
 from electabuzz_client import EB_TYPE_DOUBLE
+from polling import add_stop_handler, install_event_loop_policy, poll_until
 
 from rpi.workers.worker_a.config import WorkerAConfig, load_worker_a_config
 from rpi.service import worker_a_client
@@ -47,8 +48,8 @@ def _parse_args(argv: list[str]) -> argparse.Namespace:
 async def _initialise_hioki(config: WorkerAConfig) -> Optional[HiokiDM7275]:
     try:
         print(">> Connecting to Hioki DM7275...")
-        hioki = connect_hioki(config.hioki_port, config.hioki_range)
-        voltage = hioki.read_voltage()
+        hioki = await asyncio.to_thread(connect_hioki, config.hioki_port, config.hioki_range)
+        voltage = await asyncio.to_thread(hioki.read_voltage)
         if voltage is not None:
             print(f">> Hioki DM7275: {voltage:.6f} V")
         else:
@@ -60,16 +61,24 @@ async def _initialise_hioki(config: WorkerAConfig) -> Optional[HiokiDM7275]:
 
 
 async def _wait_for_current_drop(client: ebc.Client, config: WorkerAConfig) -> None:
-    for _ in range(int(config.current_drop_timeout)):
-        currents = await read_datapoint(client, DP_CURRENT)
+    def check_current(currents: object, elapsed: float) -> Optional[bool]:
         if isinstance(currents, list):
-            total = sum(abs(i) for i in currents)
+            total = sum(map(abs, currents))
             print(f"  Total current: {total:.3f} A")
             if total <= config.current_drop_threshold:
                 print(f">> Current dropped below {config.current_drop_threshold} A.")
-                break
-        await asyncio.sleep(config.current_check_interval)
-    else:
+                return True
+        return None
+
+    # check quickly first, then back off exponentially up to current_check_interval
+    dropped = await poll_until(
+        functools.partial(read_datapoint, client, DP_CURRENT),
+        check_current,
+        timeout=config.current_drop_timeout,
+        interval=config.current_check_interval,
+        initial_interval=config.current_check_initial,
+    )
+    if not dropped:
         print(
             f"!! Timeout: Current did not drop below {config.current_drop_threshold} A"
         )
@@ -93,11 +102,11 @@ async def main(argv: list[str] | None = None) -> int:
 
     stop_event = asyncio.Event()
 
-    def handle_stop(signum, frame) -> None:  # pragma: no cover - signal handler
+    def handle_stop() -> None:  # pragma: no cover - signal handler
         stop_event.set()
         print("\n>> Measurement interrupted. Proceeding with safe shutdown...")
 
-    signal.signal(signal.SIGINT, handle_stop)
+    add_stop_handler(handle_stop)
 
     client = await worker_a_client.connect()
     if not client:
@@ -225,4 +234,5 @@ async def main(argv: list[str] | None = None) -> int:
 
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     raise SystemExit(asyncio.run(main()))
@@ -13,34 +13,38 @@ CURRENT_DROP_THRESHOLD = 0.2  # Порог тока для безопасног
 CURRENT_DROP_TIMEOUT = 60  # Время ожидания снижения тока, сек
 
 POLLING_INTERVAL = 2.0  # Интервал опроса, сек
+LOG_FLUSH_ROWS = 30  # Строк CSV в буфере до записи на диск (~1 мин при опросе раз в 2 с)
 MAIN_MODE_TIMEOUT = 180.0  # Таймаут включения/выключения Main Mode, сек
 RETRY_DELAY = 1.0  # Задержка между повторными попытками, сек
 MAX_ENABLE_ATTEMPTS = 3  # Максимальное количество попыток включить PM Fuse
-MODE_POLL_INTERVAL = 5.0  # Интервал проверки режима Main Mode, сек
+MODE_POLL_INTERVAL = 5.0  # Интервал проверки режима Main Mode, сек (максимальный)
+MODE_POLL_INITIAL = 0.05  # Первый интервал проверки режима, удваивается до MODE_POLL_INTERVAL, сек
 MAX_VALID_OP_MODE = 5  # Максимально допустимый код режима
 SAFE_BUS_VOLTAGE_THRESHOLD = 10.0  # Порог безопасного напряжения шины, В
-CURRENT_CHECK_INTERVAL = 1.0  # Интервал проверки тока при выключении, сек
+CURRENT_CHECK_INTERVAL = 1.0  # Интервал проверки тока при выключении, сек (максимальный)
+CURRENT_CHECK_INITIAL = 0.1  # Первый интервал проверки тока, удваивается до CURRENT_CHECK_INTERVAL, сек
 
 HIOKI_PORT = "/dev/ttyACM0" # Последовательный порт Hioki DM7275
 HIOKI_RANGE = "1" # Диапазон измерения Hioki DM7275 (например, AUTO или 0.1)
 
 # === END CONFIG ===
 
+import os
 import sys
 import asyncio
+import functools
 import electabuzz_client as ebc
 from constants import cfg
 from network_utils import connect_to_device
-from datapoint_mapping import DATA_POINT_MAPPING
+from polling import add_stop_handler, install_event_loop_policy, poll_until
 from typing import Optional
-import signal
 import serial
 import csv
 from datetime import datetime
 from pathlib import Path
 import time
 
-from dm7275 import connect_dm7275, read_voltage
+from dm7275 import connect_dm7275, read_voltage_async
 
 
 from electabuzz_client import EB_TYPE_BOOL
@@ -48,118 +52,162 @@ from electabuzz_client import EB_TYPE_UINT32
 from electabuzz_client import EB_TYPE_DOUBLE
 
 
-DP_PM_FUSE = 0x3107
-DP_BUS_VOLTAGE = 0x1001
-DP_OP_MODE = 0x2000
-DP_REQ_MODE = 0x2001
-DP_SET_CURRENT = 0x1100
-DP_SET_VOLTAGE = 0x1101
-DP_CURRENT = 0x1000
-DP_VOLTAGE = 0x1002
-DP_T1 = 0x6001
-DP_T2 = 0x6002
-
-# graceful cancel flag
-stop_requested = False
-
-def request_stop(signum, frame):
-    global stop_requested
-    stop_requested = True
+from rpi.service.worker_a_client import (
+    CHANNELS,
+    CSV_HEADER,
+    DP_BUS_VOLTAGE,
+    DP_CURRENT,
+    DP_OP_MODE,
+    DP_PM_FUSE,
+    DP_REQ_MODE,
+    DP_SET_CURRENT,
+    DP_SET_VOLTAGE,
+    DP_T1,
+    DP_T2,
+    DP_VOLTAGE,
+    LINE1_NO_DM,
+    LINE1_WITH_DM,
+    ROW_I,
+    ROW_I_SUM,
+    ROW_T1,
+    ROW_T2,
+    ROW_U_DM,
+    ROW_U_TERM,
+    format_currents_line,
+    format_pm_fuse,
+    format_temperature_line,
+    read_datapoint,
+    read_many,
+)
+
+
+def request_stop(stop_event: asyncio.Event):
+    """SIGINT handler: asks the polling loop to stop for a graceful shutdown."""
+    stop_event.set()
     print("\n>> Measurement interrupted. Proceeding with safe shutdown...")
 
 
 def format_row(currents, voltage, dm7275_v=None, elapsed_s=0.0):
     i_parts = [f"{i:+.3f}" for i in currents]
-    total = sum(abs(i) for i in currents)
+    total = sum(map(abs, currents))
     u_str = f"{voltage:6.3f}"
     dm_str = f"{dm7275_v:6.3f}" if isinstance(dm7275_v, (int, float)) else "  ---"
     time_str = f"{elapsed_s:5.1f}"
     return f"{time_str} | {' '.join(i_parts)} | {total:6.3f} | {u_str} | {dm_str}"
 
 
-async def polling_loop(client: ebc.Client, hioki: serial.Serial | None, interval: float = POLLING_INTERVAL):
+async def polling_loop(client: ebc.Client, hioki: serial.Serial | None, interval: float = POLLING_INTERVAL,
+                       stop_event: asyncio.Event | None = None):
     print(">> Starting measurement loop. Press Ctrl+C to stop.")
-    global stop_requested
-    stop_requested = False
+    if stop_event is None:
+        stop_event = asyncio.Event()
+    stop_event.clear()
     iteration = 0
 
-    # Time anchor
-    start_time = time.time()
+    # Time anchor on the event loop's monotonic clock (immune to wall-clock jumps on long runs)
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
 
     # --- Prepare CSV logger ---
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_dir = Path("./log")
     log_dir.mkdir(parents=True, exist_ok=True)
     log_path = log_dir / f"log_{timestamp}.csv"
-    csv_file = log_path.open("w", newline="")
+    csv_file = log_path.open("w", newline="", buffering=1 << 20)
     writer = csv.writer(csv_file)
-    header = [
-        "timestamp",
-        "elapsed_s",
-        *[f"I{i+1}" for i in range(8)],
-        "I_sum",
-        "U_term",
-        "U_dm",
-        *[f"T1_{i+1}" for i in range(8)],
-        *[f"T2_{i+1}" for i in range(8)],
-    ]
-    writer.writerow(header)
+    row_buf = [""] * len(CSV_HEADER)  # reused for every CSV row
+    unflushed_rows = 0  # rows collect in the file buffer and are flushed every LOG_FLUSH_ROWS
+    ts_second = None  # the row timestamp only changes once per second, so reformat it only then
+    ts = ""
+    writer.writerow(CSV_HEADER)
     print(f">> Logging to {log_path}\n")
 
     # --- Print table header ---
     print(" Time | I1     I2     I3     I4     I5     I6     I7     I8    |  Sum   |   U    |  DM7275")
     print("-" * 93)
 
+    stop_wait = asyncio.ensure_future(stop_event.wait())  # completes as soon as a stop is requested
     try:
-        while not stop_requested:
+        while not stop_event.is_set():
             # Elapsed time since start
-            elapsed = time.time() - start_time
-            t_display = f"{elapsed:5.1f}"
-
-            # Read data points
-            currents = await read_datapoint(client, DP_CURRENT)
-            voltage = await read_datapoint(client, DP_VOLTAGE)
-            temps1 = await read_datapoint(client, DP_T1)
-            temps2 = await read_datapoint(client, DP_T2)
-            dm_v = read_voltage(hioki) if hioki else None
+            elapsed = loop.time() - start_time
 
-            if all(isinstance(x, list) for x in (currents, temps1, temps2)) and isinstance(voltage, (int, float)):
+            # Read data points (single round trip), overlapped with the Hioki serial query
+            if hioki:
+                values, dm_v = await asyncio.gather(
+                    read_many(client, [DP_CURRENT, DP_VOLTAGE, DP_T1, DP_T2]),
+                    read_voltage_async(hioki),
+                )
+            else:
+                values = await read_many(client, [DP_CURRENT, DP_VOLTAGE, DP_T1, DP_T2])
+                dm_v = None
+            currents = values[DP_CURRENT]
+            voltage = values[DP_VOLTAGE]
+            temps1 = values[DP_T1]
+            temps2 = values[DP_T2]
+
+            # msgpack decodes arrays to plain lists and scalars to int/float, so exact type checks suffice;
+            # a reading with a different channel count would shift the CSV columns, so it counts as failed
+            if (
+                type(currents) is list and type(temps1) is list and type(temps2) is list
+                and type(voltage) in (float, int)
+                and len(currents) == len(temps1) == len(temps2) == CHANNELS
+            ):
                 # 1️⃣ Line 1 — currents + voltages
-                sum_current = sum(abs(i) for i in currents)
-                line1 = t_display + " | " + " ".join(f"{i:+.3f}" for i in currents)
-                line1 += f" | {sum_current:6.3f} | {voltage:6.3f} | {dm_v:7.5f}" if dm_v is not None else f" | {sum_current:6.3f} | {voltage:6.3f} |   ---"
+                sum_current = sum(map(abs, currents))
+                i_str = format_currents_line(currents)
+                if dm_v is not None:
+                    line1 = LINE1_WITH_DM % (elapsed, i_str, sum_current, voltage, dm_v)
+                else:
+                    line1 = LINE1_NO_DM % (elapsed, i_str, sum_current, voltage)
                 print(line1)
 
                 # 2️⃣ Line 2 — T1
-                line2 = " " * 6 + " " + " ".join(f"{t:5.1f}" for t in temps1) + " |  T1"
+                line2 = format_temperature_line("T1", temps1)
                 print(line2)
 
                 # 3️⃣ Line 3 — T2
-                line3 = " " * 6 + " " + " ".join(f"{t:5.1f}" for t in temps2) + " |  T2"
+                line3 = format_temperature_line("T2", temps2)
                 print(line3)
 
                 # 🔄 CSV log
-                writer.writerow([
-                    datetime.now().isoformat(timespec="seconds"),
-                    round(elapsed, 2),
-                    *currents,
-                    sum_current,
-                    voltage,
-                    dm_v if dm_v is not None else "",
-                    *temps1,
-                    *temps2
-                ])
+                now_s = int(time.time())
+                if now_s != ts_second:
+                    ts_second = now_s
+                    ts = datetime.fromtimestamp(now_s).isoformat(timespec="seconds")
+                row_buf[0] = ts
+                row_buf[1] = f"{elapsed:.2f}"
+                row_buf[ROW_I] = currents
+                row_buf[ROW_I_SUM] = sum_current
+                row_buf[ROW_U_TERM] = voltage
+                row_buf[ROW_U_DM] = dm_v if dm_v is not None else ""
+                row_buf[ROW_T1] = temps1
+                row_buf[ROW_T2] = temps2
+                writer.writerow(row_buf)
+                unflushed_rows += 1
+                if unflushed_rows >= LOG_FLUSH_ROWS or stop_event.is_set():
+                    csv_file.flush()
+                    unflushed_rows = 0
             else:
                 print("!! Failed to read one or more datapoints (1000, 1002, 6001, 6002)")
 
-            next_ts = start_time + (iteration + 1) * interval
-            sleep_time = max(0.0, next_ts - time.time())
-            await asyncio.sleep(sleep_time)
+            # Wake up exactly at the next tick, scheduled on the loop clock
             iteration += 1
+            tick = loop.create_future()
+            tick_handle = loop.call_at(start_time + iteration * interval, tick.set_result, None)
+            try:
+                # a stop request ends the wait immediately instead of after the tick
+                await asyncio.wait((tick, stop_wait), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                tick_handle.cancel()
 
     except KeyboardInterrupt:
         print("\n>> Measurement interrupted. Proceeding with safe shutdown...")
     finally:
+        stop_wait.cancel()
+        # make the tail of the log durable even when the run ends with Ctrl+C
+        csv_file.flush()
+        os.fsync(csv_file.fileno())
         csv_file.close()
         print(f">> Log file saved: {log_path}")
 
@@ -175,30 +223,6 @@ async def connect() -> Optional[ebc.Client]:
     return client
 
 
-def format_pm_fuse(val) -> str:
-    """Formats the value of the PM Fuse datapoint into human-readable output."""
-    name = DATA_POINT_MAPPING.get("0x3107", {}).get("name", "PM Fuse On/Off")
-    if isinstance(val, list):
-        channel_bits = " ".join("1" if x else "0" for x in val)
-        status = "ON" if all(val) else "OFF"
-        return f">> Power modules: [{channel_bits}]\n>> Status: {status}"
-    elif isinstance(val, bool):
-        return f"{name}: {'ON' if val else 'OFF'}"
-    else:
-        return f"{name}: {val!r}"
-
-
-async def read_datapoint(client: ebc.Client, dp_id: int) -> Optional[any]:
-    """Reads a single datapoint and returns its 'value', or None."""
-    try:
-        result = await client.multi_read([dp_id])
-        if dp_id in result:
-            return result[dp_id].get("value")
-    except Exception as e:
-        print(f"!! Failed to read 0x{dp_id:04X}: {e}")
-    return None
-
-
 async def enable_all_pm_modules(client: ebc.Client) -> bool:
     """Sends [True]*8 to 0x3107 to enable all PM modules."""
     try:
@@ -234,35 +258,36 @@ async def switch_main_mode(client: ebc.Client, target_mode: int, timeout: float
         return False
 
     print(f">> Waiting for mode confirmation in 0x{DP_OP_MODE:04X} == {target_mode}...")
-    poll_interval = MODE_POLL_INTERVAL
-    elapsed = 0.0
-
-    while elapsed < timeout:
-        await asyncio.sleep(poll_interval)
-        elapsed += poll_interval
 
-        actual_mode = await read_datapoint(client, DP_OP_MODE)
+    def check_mode(actual_mode, elapsed):
         if actual_mode is None:
-            print(f">>\t0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.0f}s")
-            continue
-
-        print(f"\t 0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.0f}s")
-
+            print(f">>\t0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.1f}s")
+            return None
+        print(f"\t 0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.1f}s")
         if actual_mode == target_mode:
             print(f">> Main mode successfully set to {target_mode}.")
             return True
-        elif isinstance(actual_mode, int) and actual_mode > MAX_VALID_OP_MODE:
+        if isinstance(actual_mode, int) and actual_mode > MAX_VALID_OP_MODE:
             print(
                 f"!! Error: 0x{DP_OP_MODE:04X} = {actual_mode} (> {MAX_VALID_OP_MODE}). Aborting."
             )
             return False
+        return None
+
+    # poll quickly first and back off exponentially up to MODE_POLL_INTERVAL
+    decision = await poll_until(
+        functools.partial(read_datapoint, client, DP_OP_MODE), check_mode,
+        timeout=timeout, interval=MODE_POLL_INTERVAL, initial_interval=MODE_POLL_INITIAL,
+    )
+    if decision is not None:
+        return decision
 
     print(f"!! Timeout: 0x{DP_OP_MODE:04X} did not become {target_mode} within {int(timeout)} seconds.")
     return False
 
 
 def format_three_lines(currents, voltage, dm7275, temps1, temps2):
-    sum_current = sum(abs(i) for i in currents)
+    sum_current = sum(map(abs, currents))
     line1 = " ".join(f"{i:.3f}".rjust(6) for i in currents) + f" | {sum_current:6.3f} | {voltage:5.3f} | {dm7275:6.3f}" if dm7275 is not None else "  --"
     line2 = " ".join(f"{t:.1f}".rjust(6) for t in temps1) + " |  T1"
     line3 = " ".join(f"{t:.1f}".rjust(6) for t in temps2) + " |  T2"
@@ -271,7 +296,8 @@ def format_three_lines(currents, voltage, dm7275, temps1, temps2):
 
 
 async def main():
-    signal.signal(signal.SIGINT, request_stop)
+    stop_event = asyncio.Event()
+    add_stop_handler(functools.partial(request_stop, stop_event))
 
     client = await connect()
     if not client:
@@ -280,8 +306,8 @@ async def main():
     # Try to connect to DM7275
     try:
         print(">> Connecting to Hioki DM7275...")
-        hioki = connect_dm7275(HIOKI_PORT, rng=HIOKI_RANGE)
-        v = read_voltage(hioki)
+        hioki = await asyncio.to_thread(connect_dm7275, HIOKI_PORT, rng=HIOKI_RANGE)
+        v = await read_voltage_async(hioki)
         if v is not None:
             print(f">> Hioki DM7275: {v:.6f} V")
         else:
@@ -370,22 +396,26 @@ async def main():
 
 
 
-    await polling_loop(client, hioki, interval=POLLING_INTERVAL)
+    await polling_loop(client, hioki, interval=POLLING_INTERVAL, stop_event=stop_event)
 
     print(f">> Setting current to {STOP_CURRENT} A (0x{DP_SET_CURRENT:04X})...")
     await client.single_write(DP_SET_CURRENT, STOP_CURRENT, EB_TYPE_DOUBLE)
 
     print(f">> Waiting for total current to drop below {CURRENT_DROP_THRESHOLD} A...")
-    for i in range(int(CURRENT_DROP_TIMEOUT)):
-        currents = await read_datapoint(client, DP_CURRENT)
+    def check_current(currents, elapsed):
         if isinstance(currents, list):
-            total = sum(abs(i) for i in currents)
+            total = sum(map(abs, currents))
             print(f"  Total current: {total:.3f} A")
             if total <= CURRENT_DROP_THRESHOLD:
                 print(f">> Current dropped below {CURRENT_DROP_THRESHOLD} A.")
-                break
-        await asyncio.sleep(CURRENT_CHECK_INTERVAL)
-    else:
+                return True
+        return None
+
+    dropped = await poll_until(
+        functools.partial(read_datapoint, client, DP_CURRENT), check_current,
+        timeout=CURRENT_DROP_TIMEOUT, interval=CURRENT_CHECK_INTERVAL, initial_interval=CURRENT_CHECK_INITIAL,
+    )
+    if not dropped:
         print(
             f"!! Timeout: Current did not drop below {CURRENT_DROP_THRESHOLD} A"
         )
@@ -402,6 +432,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     try:
         exit_code = asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,4 +1,6 @@
 import asyncio
+import os
+import socket
 from electabuzz_client import (
     Client,
     EbResult,
@@ -25,105 +27,204 @@ TYPE_MAP = {
     "EB_TYPE_UNKOWN": EB_TYPE_UNKOWN,
 }
 
+DEFAULT_TYPE_NAME = "EB_TYPE_DOUBLE"
+# per-command console tracing; off by default since stdout writes cost more than the EB call
+TRACE_COMMANDS = os.environ.get("EB_TRACE") == "1"
+COMMAND_LINE_LIMIT = 4096  # commands are short ASCII lines, no need for the 64 KiB stream default
 
-def _convert_value_for_type(type_name: str, raw_values: list[str]):
-    """Convert raw string values into Electabuzz payload respecting the DP type."""
+# datapoint id -> type name / EB type constant, resolved once instead of per write command
+_DP_TO_TYPENAME = {
+    int(point, 16): info.get("type", DEFAULT_TYPE_NAME) for point, info in DATA_POINT_MAPPING.items()
+}
+_DP_TO_EBTYPE = {dp: TYPE_MAP.get(type_name, EB_TYPE_UNKOWN) for dp, type_name in _DP_TO_TYPENAME.items()}
+
+# raw command token -> datapoint id for the known points, in the spellings clients use
+# (b"1000", b"0x1000", b"110a", b"0x110A", ...); anything else falls back to int(token, 16)
+_RAW_TO_DP = {}
+for _dp in _DP_TO_TYPENAME:
+    for _digits in (b"%04x" % _dp, b"%04X" % _dp):
+        _RAW_TO_DP[_digits] = _RAW_TO_DP[b"0x" + _digits] = _RAW_TO_DP[b"0X" + _digits] = _dp
+del _dp, _digits
+
+
+def _decode_token(raw: bytes) -> str:
+    return raw.decode("ascii", errors="replace")
+
+
+def _parse_dp(datapoint_raw: bytes) -> int:
+    dp = _RAW_TO_DP.get(datapoint_raw)
+    if dp is not None:
+        return dp
+    try:
+        return int(datapoint_raw, 16)
+    except ValueError:
+        # quote the text token so the error reply shows 'zz' rather than b'zz'
+        raise ValueError(
+            f"invalid literal for int() with base 16: {_decode_token(datapoint_raw)!r}"
+        ) from None
+
+
+_TRUTHY = frozenset((b"1", b"true", b"yes", b"on"))
+
+
+def _to_bool(v: bytes) -> bool:
+    return v.strip().lower() in _TRUTHY
+
+
+# EB type name -> caster for a single raw token; int() and float() accept ASCII bytes directly,
+# anything not listed is sent as float
+_CASTERS = {
+    "EB_TYPE_BOOL": _to_bool,
+    "EB_TYPE_UINT32": int,
+    "EB_TYPE_UINT16": int,
+    "EB_TYPE_INT32": int,
+    "EB_TYPE_INT8": int,
+}
+
+
+def _convert_value_for_type(type_name: str, raw_values: list[bytes]):
+    """Convert raw command tokens into Electabuzz payload respecting the DP type."""
+
+    cast = _CASTERS.get(type_name, float)
+    values = []
+    for raw in raw_values:
+        try:
+            values.append(cast(raw))
+        except ValueError:
+            # quote the text token so the error reply shows 'x' rather than b'x'
+            raise ValueError(f"invalid literal for {type_name}: {_decode_token(raw)!r}") from None
+    return values[0] if len(values) == 1 else values
 
-    if type_name == "EB_TYPE_BOOL":
-        def to_bool(v: str) -> bool:
-            s = v.strip().lower()
-            return s in ("1", "true", "yes", "on")
 
-        return to_bool(raw_values[0]) if len(raw_values) == 1 else [to_bool(v) for v in raw_values]
+USAGE_RESPONSE = b"<<< Usage:\n r <hex_dp> [<hex_dp> ...]\n w <hex_dp> <values>\n"
 
-    if type_name in {"EB_TYPE_UINT32", "EB_TYPE_UINT16", "EB_TYPE_INT32", "EB_TYPE_INT8"}:
-        caster = int
-    else:
-        caster = float
 
-    return caster(raw_values[0]) if len(raw_values) == 1 else [caster(v) for v in raw_values]
+def _to_bytes(value) -> bytes:
+    return str(value).encode("ascii", "replace")
 
 
-async def handle_connection(reader, writer, client):
+async def _handle_read(client, datapoints_raw: list[bytes]) -> bytes:
+    dps = [_parse_dp(raw) for raw in datapoints_raw]
+    result = await client.multi_read(dps)  # one request for all datapoints of the command
+    lines = []
+    for dp in dps:
+        r = result.get(dp) if result else None
+        if r:
+            lines.append(b"<<< READ 0x%04X = %b (%b)\n" % (dp, _to_bytes(r.get('value')), r['result_string'].encode()))
+        else:
+            lines.append(b"<<< Failed to read 0x%04X\n" % dp)
+    return b"".join(lines)
+
+
+async def _handle_write(client, datapoint_raw: bytes, raw_values: list[bytes]) -> bytes:
+    dp = _parse_dp(datapoint_raw)
+    type_name = _DP_TO_TYPENAME.get(dp, DEFAULT_TYPE_NAME)
+    eb_type = _DP_TO_EBTYPE.get(dp, TYPE_MAP[DEFAULT_TYPE_NAME])
+    try:
+        value = _convert_value_for_type(type_name, raw_values)
+    except ValueError as exc:
+        return b"<<< Invalid value for %b: %b\n" % (type_name.encode(), _to_bytes(exc))
+    res = await client.single_write(dp, value, eb_type=eb_type)
+    if res == EbResult.EB_OK:
+        return b"<<< WROTE 0x%04X = %b (%b)\n" % (dp, _to_bytes(value), res.name.encode())
+    if res is None:
+        return b"<<< WROTE 0x%04X = %b (no response)\n" % (dp, _to_bytes(value))
+    return b"<<< WRITE 0x%04X ERR %b\n" % (dp, res.name.encode())
+
+
+async def _process_command(client, parts: list[bytes]) -> bytes:
+    """Execute one split bridge command and return the encoded response line(s)."""
+    op = parts[0].lower()
+    try:
+        if op == b"r" and len(parts) >= 2:
+            return await _handle_read(client, parts[1:])
+        if op == b"w" and len(parts) >= 3:
+            return await _handle_write(client, parts[1], parts[2:])
+        return USAGE_RESPONSE
+    except Exception as e:
+        return b"<<< ERROR: %b\n" % _to_bytes(e)
+
+
+async def handle_connection(reader, writer, client, client_ready: asyncio.Event | None = None):
     addr = writer.get_extra_info("peername")
     print(f">> Connected from {addr}")
+    if client_ready is not None:
+        # the listener is up before the controller link; hold early clients until it is ready
+        await client_ready.wait()
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        # responses are short single lines; never hold them back for Nagle coalescing
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     writer.write(b">> Connected to Raspberry Pi Electabuzz bridge\n")
     await writer.drain()
 
     while True:
-        data = await reader.readline()
-        if not data:
+        try:
+            data = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as exc:
+            data = exc.partial  # peer closed; still run a final unterminated command
+        except asyncio.LimitOverrunError:
+            print(f">> [{addr}] command longer than {COMMAND_LINE_LIMIT} bytes, closing")
             break
-        cmd = data.decode().strip()
-        if cmd.lower() in ("exit", "quit"):
+        if not data:
             break
-
-        print(f">> [{addr}] CMD: {cmd}")
-        parts = cmd.split()
+        # commands are ASCII, so they are split and parsed as bytes without a decode step
+        parts = data.split()
         if not parts:
             continue
-        op = parts[0].lower()
-        response = ""
+        if parts[0].lower() in (b"exit", b"quit"):
+            break
 
-        try:
-            if op == "r" and len(parts) == 2:
-                dp = int(parts[1], 16)
-                result = await client.multi_read([dp])
-                if result and dp in result:
-                    r = result[dp]
-                    response = f"<<< READ 0x{dp:04X} = {r['value']} ({r['result_string']})\n"
-                else:
-                    response = f"<<< Failed to read 0x{dp:04X}\n"
-
-
-            elif op == "w" and len(parts) >= 3:
-                dp = int(parts[1], 16)
-                point_key = f"0x{dp:04x}"
-                type_name = DATA_POINT_MAPPING.get(point_key, {}).get("type", "EB_TYPE_DOUBLE")
-                eb_type = TYPE_MAP.get(type_name, EB_TYPE_UNKOWN)
-                try:
-                    value = _convert_value_for_type(type_name, parts[2:])
-                except ValueError as exc:
-                    response = f"<<< Invalid value for {type_name}: {exc}\n"
-                else:
-                    res = await client.single_write(dp, value, eb_type=eb_type)
-                    if res == EbResult.EB_OK:
-                        response = f"<<< WROTE 0x{dp:04X} = {value} ({res.name})\n"
-                    elif res is None:
-                        response = f"<<< WROTE 0x{dp:04X} = {value} (no response)\n"
-                    else:
-                        response = f"<<< WRITE 0x{dp:04X} ERR {res.name}\n"
-
-
-            else:
-                response = "<<< Usage:\n r <hex_dp>\n w <hex_dp> <values>\n"
-
-        except Exception as e:
-            response = f"<<< ERROR: {e}\n"
-
-        writer.write(response.encode())
+        if TRACE_COMMANDS:
+            print(f">> [{addr}] CMD: {b' '.join(parts).decode('ascii', 'replace')}")
+
+        response = await _process_command(client, parts)
+
+        writer.write(response)
         await writer.drain()
-        print(response.strip())
+        if TRACE_COMMANDS:
+            print(response.decode("ascii").strip())
 
     writer.close()
     await writer.wait_closed()
     print(f">> Disconnected {addr}")
 
 async def main():
-    print(f">> Connecting to controller {cfg.host}:{cfg.port} ...")
+    # one Client for all sessions: the multiplexer takes one outstanding request at a time,
+    # which the Client's tx_rx_lock enforces across concurrent PC connections
     client = Client()
-    await client.connect(cfg.host, cfg.port, recv_timeout_ms=cfg.recv_timeout_ms)
-    print(f">> Connected to {cfg.host}:{cfg.port}")
+    client_ready = asyncio.Event()
+    connected = False
+
+    async def connect_controller():
+        nonlocal connected
+        print(f">> Connecting to controller {cfg.host}:{cfg.port} ...")
+        await client.connect(cfg.host, cfg.port, recv_timeout_ms=cfg.recv_timeout_ms)
+        connected = True
+        print(f">> Connected to {cfg.host}:{cfg.port}")
+        client_ready.set()
 
-    server = await asyncio.start_server(
-        lambda r, w: handle_connection(r, w, client),
-        "0.0.0.0", 5050
-    )
-    print(">> Listening on port 5050 for PC connections...")
-    async with server:
-        await server.serve_forever()
+    try:
+        async with asyncio.TaskGroup() as tg:
+            # resolve/connect the controller while the listener is being bound
+            tg.create_task(connect_controller())
+            server = await asyncio.start_server(
+                lambda r, w: handle_connection(r, w, client, client_ready),
+                "0.0.0.0", 5050, limit=COMMAND_LINE_LIMIT, backlog=128
+            )
+            print(">> Listening on port 5050 for PC connections...")
+            async with server:
+                await server.serve_forever()
+    finally:
+        if connected:
+            client.close()
 
 if __name__ == "__main__":
+    try:
+        import uvloop  # optional libuv event loop for the TCP/UDP bridge, falls back to the default loop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
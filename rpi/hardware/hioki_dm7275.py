@@ -2,13 +2,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
-
-import serial
+from typing import TYPE_CHECKING, Optional
 
 from dm7275 import connect_dm7275 as _connect_dm7275
 from dm7275 import read_voltage as _read_voltage
 
+if TYPE_CHECKING:
+    import serial
+
 
 @dataclass(slots=True)
 class HiokiDM7275:
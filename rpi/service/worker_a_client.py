@@ -1,15 +1,16 @@
 """Client helpers for the Worker A measurement workflow on Raspberry Pi."""
 from __future__ import annotations
 
-import asyncio
+import functools
 from typing import Iterable, Optional
 
 import electabuzz_client as ebc
 from constants import cfg
-from datapoint_mapping import DATA_POINT_MAPPING
+from datapoint_mapping import DATA_POINT_NAMES
 from electabuzz_client import EB_TYPE_BOOL, EB_TYPE_UINT32
 
 from network_utils import connect_to_device
+from polling import poll_until
 
 # Datapoint identifiers used by the worker script
 DP_PM_FUSE = 0x3107
@@ -23,6 +24,40 @@ DP_VOLTAGE = 0x1002
 DP_T1 = 0x6001
 DP_T2 = 0x6002
 
+# Number of channels in the current and temperature datapoints
+CHANNELS = 8
+
+# CSV log header, built once
+CSV_HEADER = [
+    "timestamp",
+    "elapsed_s",
+    *[f"I{i+1}" for i in range(CHANNELS)],
+    "I_sum",
+    "U_term",
+    "U_dm",
+    *[f"T1_{i+1}" for i in range(CHANNELS)],
+    *[f"T2_{i+1}" for i in range(CHANNELS)],
+]
+# Positions of the fields inside a CSV row (see CSV_HEADER)
+ROW_I = slice(2, 2 + CHANNELS)
+ROW_I_SUM = 2 + CHANNELS
+ROW_U_TERM = 3 + CHANNELS
+ROW_U_DM = 4 + CHANNELS
+ROW_T1 = slice(5 + CHANNELS, 5 + 2 * CHANNELS)
+ROW_T2 = slice(5 + 2 * CHANNELS, 5 + 3 * CHANNELS)
+
+# Console line 1 (elapsed | currents | sum | U_term | DM7275), with and without a Hioki reading
+LINE1_WITH_DM = "%5.1f | %s | %6.3f | %6.3f | %7.5f"
+LINE1_NO_DM = "%5.1f | %s | %6.3f | %6.3f |   ---"
+
+# Console templates for a full set of channels, built once
+_CURRENTS_FMT = " ".join(["%+.3f"] * CHANNELS)
+_TEMPS_FMT = " ".join(["%5.1f"] * CHANNELS)
+_TEMP_PREFIX = " " * 7  # temperature lines start under the currents column
+
+# display name of the PM fuse datapoint, resolved once from the static mapping
+_PM_FUSE_NAME = DATA_POINT_NAMES.get(DP_PM_FUSE, "PM Fuse On/Off")
+
 
 async def connect() -> Optional[ebc.Client]:
     """Connect to the Electabuzz device and return the client on success."""
@@ -35,12 +70,26 @@ async def connect() -> Optional[ebc.Client]:
     return client
 
 
+async def read_many(client: ebc.Client, dp_ids: list[int]) -> dict[int, Optional[object]]:
+    """Read several datapoints in one request; failed entries map to ``None``."""
+    values: dict[int, Optional[object]] = dict.fromkeys(dp_ids)
+    try:
+        result = await client.multi_read(dp_ids)
+    except Exception as exc:  # pragma: no cover - defensive logging
+        print(f"!! Failed to read {', '.join(f'0x{dp_id:04X}' for dp_id in dp_ids)}: {exc}")
+        return values
+    if result:
+        for dp_id in dp_ids:
+            entry = result.get(dp_id)
+            if entry:
+                values[dp_id] = entry.get("value")
+    return values
+
+
 async def read_datapoint(client: ebc.Client, dp_id: int) -> Optional[object]:
     """Return the value of a single datapoint or ``None`` on failure."""
     try:
-        result = await client.multi_read([dp_id])
-        if dp_id in result:
-            return result[dp_id].get("value")
+        return await client.single_read(dp_id)
     except Exception as exc:  # pragma: no cover - defensive logging
         print(f"!! Failed to read 0x{dp_id:04X}: {exc}")
     return None
@@ -66,8 +115,13 @@ async def switch_main_mode(
     timeout: float,
     poll_interval: float,
     max_valid_op_mode: int,
+    initial_poll_interval: float = 0.05,
 ) -> bool:
-    """Request the main mode change and wait until it is reflected by the device."""
+    """Request the main mode change and wait until it is reflected by the device.
+
+    The operating mode is polled right away and then after ``initial_poll_interval``
+    seconds, doubling the delay after each poll up to ``poll_interval``.
+    """
     assert target_mode in (0, 1), "target_mode must be 0 or 1"
 
     try:
@@ -81,19 +135,12 @@ async def switch_main_mode(
         return False
 
     print(f">> Waiting for mode confirmation in 0x{DP_OP_MODE:04X} == {target_mode}...")
-    elapsed = 0.0
-
-    while elapsed < timeout:
-        await asyncio.sleep(poll_interval)
-        elapsed += poll_interval
 
-        actual_mode = await read_datapoint(client, DP_OP_MODE)
+    def check_mode(actual_mode: Optional[object], elapsed: float) -> Optional[bool]:
         if actual_mode is None:
-            print(f">>\t0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.0f}s")
-            continue
-
-        print(f"\t 0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.0f}s")
-
+            print(f">>\t0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.1f}s")
+            return None
+        print(f"\t 0x{DP_OP_MODE:04X} = {actual_mode} at {elapsed:.1f}s")
         if actual_mode == target_mode:
             print(f">> Main mode successfully set to {target_mode}.")
             return True
@@ -102,6 +149,17 @@ async def switch_main_mode(
                 f"!! Error: 0x{DP_OP_MODE:04X} = {actual_mode} (> {max_valid_op_mode}). Aborting."
             )
             return False
+        return None
+
+    decision = await poll_until(
+        functools.partial(read_datapoint, client, DP_OP_MODE),
+        check_mode,
+        timeout=timeout,
+        interval=poll_interval,
+        initial_interval=initial_poll_interval,
+    )
+    if decision is not None:
+        return decision
 
     print(
         f"!! Timeout: 0x{DP_OP_MODE:04X} did not become {target_mode} within {int(timeout)} seconds."
@@ -111,21 +169,28 @@ async def switch_main_mode(
 
 def format_pm_fuse(value: object) -> str:
     """Return a human readable description of the PM fuse state."""
-    name = DATA_POINT_MAPPING.get("0x3107", {}).get("name", "PM Fuse On/Off")
     if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
         bits = " ".join("1" if bool(x) else "0" for x in value)
         status = "ON" if all(bool(x) for x in value) else "OFF"
         return f">> Power modules: [{bits}]\n>> Status: {status}"
     if isinstance(value, bool):
-        return f"{name}: {'ON' if value else 'OFF'}"
-    return f"{name}: {value!r}"
+        return f"{_PM_FUSE_NAME}: {'ON' if value else 'OFF'}"
+    return f"{_PM_FUSE_NAME}: {value!r}"
+
+
+def _format_channels(fmt: str, item_fmt: str, values: Iterable[float]) -> str:
+    """Apply the prebuilt template to a full channel set, formatting item-wise otherwise."""
+    values = tuple(values)
+    if len(values) == CHANNELS:
+        return fmt % values
+    return " ".join(item_fmt % value for value in values)
 
 
 def format_currents_line(currents: Iterable[float]) -> str:
     """Format a sequence of currents for console output."""
-    return " ".join(f"{current:+.3f}" for current in currents)
+    return _format_channels(_CURRENTS_FMT, "%+.3f", currents)
 
 
 def format_temperature_line(label: str, values: Iterable[float]) -> str:
     """Format a temperature row for console output."""
-    return " " * 6 + " " + " ".join(f"{temp:5.1f}" for temp in values) + f" |  {label}"
+    return _TEMP_PREFIX + _format_channels(_TEMPS_FMT, "%5.1f", values) + f" |  {label}"
@@ -5,6 +5,20 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+# Numeric settings that must not be negative, checked by WorkerAConfig.validate()
+_NON_NEGATIVE_FIELDS = (
+    "set_voltage",
+    "set_current",
+    "current_drop_threshold",
+    "polling_interval",
+    "main_mode_timeout",
+    "retry_delay",
+    "mode_poll_interval",
+    "safe_bus_voltage_threshold",
+    "current_check_interval",
+    "current_check_initial",
+)
+
 
 @dataclass(slots=True)
 class WorkerAConfig:
@@ -17,6 +31,9 @@ class WorkerAConfig:
     current_drop_timeout: float = 60.0
 
     polling_interval: float = 2.0
+    log_flush_rows: int = 30
+    print_every: int = 1
+    fill_skipped_samples: bool = False
     main_mode_timeout: float = 180.0
     retry_delay: float = 1.0
     max_enable_attempts: int = 3
@@ -24,6 +41,7 @@ class WorkerAConfig:
     max_valid_op_mode: int = 5
     safe_bus_voltage_threshold: float = 10.0
     current_check_interval: float = 1.0
+    current_check_initial: float = 0.1
 
     hioki_port: str = "/dev/ttyACM0"
     hioki_range: str = "1"
@@ -32,23 +50,17 @@ class WorkerAConfig:
 
     def validate(self) -> None:
         """Validate numeric ranges to avoid infinite loops or crashes."""
-        numeric_checks = {
-            "set_voltage": self.set_voltage,
-            "set_current": self.set_current,
-            "current_drop_threshold": self.current_drop_threshold,
-            "polling_interval": self.polling_interval,
-            "main_mode_timeout": self.main_mode_timeout,
-            "retry_delay": self.retry_delay,
-            "mode_poll_interval": self.mode_poll_interval,
-            "safe_bus_voltage_threshold": self.safe_bus_voltage_threshold,
-            "current_check_interval": self.current_check_interval,
-        }
-        for name, value in numeric_checks.items():
+        for name in _NON_NEGATIVE_FIELDS:
+            value = getattr(self, name)
             if value < 0:
                 raise ValueError(f"{name} must be non-negative, got {value!r}")
 
         if self.max_enable_attempts <= 0:
             raise ValueError("max_enable_attempts must be positive")
+        if self.log_flush_rows <= 0:
+            raise ValueError("log_flush_rows must be positive")
+        if self.print_every <= 0:
+            raise ValueError("print_every must be positive")
         if self.current_drop_timeout < 0:
             raise ValueError("current_drop_timeout must be non-negative")
 
@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 import asyncio
-import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
 import time
 from dataclasses import dataclass
 from datetime import datetime
@@ -13,15 +14,41 @@ import electabuzz_client as ebc
 
 from rpi.workers.worker_a.config import WorkerAConfig
 from rpi.service.worker_a_client import (
+    CHANNELS,
+    CSV_HEADER,
     DP_CURRENT,
     DP_T1,
     DP_T2,
     DP_VOLTAGE,
+    LINE1_NO_DM,
+    LINE1_WITH_DM,
+    ROW_I,
+    ROW_I_SUM,
+    ROW_T1,
+    ROW_T2,
+    ROW_U_DM,
+    ROW_U_TERM,
     format_currents_line,
     format_temperature_line,
-    read_datapoint,
+    read_many,
 )
 
+# CSV header line, encoded once
+_CSV_HEADER_LINE = (",".join(CSV_HEADER) + "\r\n").encode()
+# with config.fill_skipped_samples the log gains a trailing flag column marking filler rows
+_CSV_HEADER_LINE_FILLED = (",".join([*CSV_HEADER, "filled"]) + "\r\n").encode()
+
+# writev() takes at most IOV_MAX buffers per call
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
+# Adaptive cadence: smoothing factor of the per-tick work-time average, the fractions of
+# config.polling_interval above which the interval is widened and below which it is restored,
+# and the headroom kept over the average while widened
+_EWMA_ALPHA = 0.2
+_WIDEN_RATIO = 0.9
+_RELAX_RATIO = 0.6
+_WIDEN_MARGIN = 1.1
+
 
 class VoltageReader(Protocol):
     """Minimal protocol for the Hioki adapter used in measurements."""
@@ -30,6 +57,21 @@ class VoltageReader(Protocol):
         ...
 
 
+def _write_rows(fd: int, rows: list[bytes]) -> None:
+    """Write one batch of encoded log lines with as few writev() calls as possible."""
+    while rows:
+        chunk = rows[:_IOV_MAX]
+        written = os.writev(fd, chunk)
+        # a short write leaves part of the chunk behind; drop what went out and retry the rest
+        for i, row in enumerate(chunk):
+            if written < len(row):
+                rows = [row[written:], *chunk[i + 1 :], *rows[len(chunk) :]]
+                break
+            written -= len(row)
+        else:
+            rows = rows[len(chunk) :]
+
+
 @dataclass(slots=True)
 class MeasurementResult:
     """Value object describing the measurement session output."""
@@ -48,25 +90,27 @@ async def run_measurements(
     stop_event = stop_event or asyncio.Event()
 
     print(">> Starting measurement loop. Press Ctrl+C to stop.")
-    start_time = time.time()
+    # schedule on the loop's monotonic clock so wall-clock adjustments cannot shift the cadence
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     config.log_directory.mkdir(parents=True, exist_ok=True)
     log_path = config.log_directory / f"log_{timestamp}.csv"
 
-    with log_path.open("w", newline="") as csv_file:
-        writer = csv.writer(csv_file)
-        header = [
-            "timestamp",
-            "elapsed_s",
-            *[f"I{i+1}" for i in range(8)],
-            "I_sum",
-            "U_term",
-            "U_dm",
-            *[f"T1_{i+1}" for i in range(8)],
-            *[f"T2_{i+1}" for i in range(8)],
-        ]
-        writer.writerow(header)
+    # unbuffered: rows are batched here and handed to the kernel with a single writev()
+    with log_path.open("wb", buffering=0) as csv_file:
+        fd = csv_file.fileno()
+        fill_skipped = config.fill_skipped_samples
+        _write_rows(fd, [_CSV_HEADER_LINE_FILLED if fill_skipped else _CSV_HEADER_LINE])
+        row_end = ",0\r\n" if fill_skipped else "\r\n"
+        last_line = None  # previous sample's CSV fields, repeated for skipped ticks
+        # double buffering: rows fill pending_rows while the previous batch of
+        # config.log_flush_rows rows is written in a worker thread
+        pending_rows: list[bytes] = []
+        row_buf = [""] * len(CSV_HEADER)  # reused for every CSV row
+        write_task: Optional[asyncio.Task] = None
+        writing_rows: list[bytes] = []  # the batch write_task is writing
         print(f">> Logging to {log_path}\n")
 
         print(
@@ -74,55 +118,148 @@ async def run_measurements(
         )
         print("-" * 93)
 
+        # bind the per-tick lookups once; the loop body then only touches locals
+        clock = loop.time
+        wall_time = time.time
+        stopped = stop_event.is_set
+        read_hioki = hioki.read_voltage if hioki else None
+        # Hioki queries get their own thread so they never queue behind log writes in the default pool
+        hioki_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hioki") if hioki else None
+        interval = config.polling_interval
+        print_every = config.print_every
+        flush_rows = config.log_flush_rows
+        poll_ids = [DP_CURRENT, DP_VOLTAGE, DP_T1, DP_T2]
+
+        # the cadence widens while the reads/logging take most of config.polling_interval
+        effective_interval = interval
+        work_avg = None
+        deadline = start_time
+
         iteration = 0
+        ts_second = None  # the row timestamp only changes once per second, so reformat it only then
+        timestamp_str = ""
         try:
-            while not stop_event.is_set():
-                elapsed = time.time() - start_time
+            while not stopped():
+                tick_start = clock()
+                elapsed = tick_start - start_time
 
-                currents = await read_datapoint(client, DP_CURRENT)
-                voltage = await read_datapoint(client, DP_VOLTAGE)
-                temps1 = await read_datapoint(client, DP_T1)
-                temps2 = await read_datapoint(client, DP_T2)
-                dm_voltage = hioki.read_voltage() if hioki else None
+                # one round trip for all four datapoints instead of one request each
+                if read_hioki:
+                    # the blocking serial query runs in the Hioki thread while the EB read is in flight
+                    values, dm_voltage = await asyncio.gather(
+                        read_many(client, poll_ids), loop.run_in_executor(hioki_exec, read_hioki)
+                    )
+                else:
+                    values = await read_many(client, poll_ids)
+                    dm_voltage = None
+                currents = values[DP_CURRENT]
+                voltage = values[DP_VOLTAGE]
+                temps1 = values[DP_T1]
+                temps2 = values[DP_T2]
 
-                if all(isinstance(x, list) for x in (currents, temps1, temps2)) and isinstance(
-                    voltage, (int, float)
+                # msgpack decodes arrays to plain lists and scalars to int/float; a reading with
+                # a different channel count would shift the CSV columns, so it counts as failed
+                if (
+                    type(currents) is list
+                    and type(temps1) is list
+                    and type(temps2) is list
+                    and type(voltage) in (float, int)
+                    and len(currents) == len(temps1) == len(temps2) == CHANNELS
                 ):
-                    total_current = sum(abs(i) for i in currents)
-                    time_str = f"{elapsed:5.1f}"
-                    if dm_voltage is not None:
-                        line1 = (
-                            f"{time_str} | {format_currents_line(currents)} | {total_current:6.3f} "
-                            f"| {voltage:6.3f} | {dm_voltage:7.5f}"
+                    total_current = sum(map(abs, currents))
+                    if iteration % print_every == 0:
+                        currents_str = format_currents_line(currents)
+                        if dm_voltage is not None:
+                            line1 = LINE1_WITH_DM % (
+                                elapsed, currents_str, total_current, voltage, dm_voltage
+                            )
+                        else:
+                            line1 = LINE1_NO_DM % (elapsed, currents_str, total_current, voltage)
+                        # one stdout write for the three console lines
+                        print(
+                            line1,
+                            format_temperature_line("T1", temps1),
+                            format_temperature_line("T2", temps2),
+                            sep="\n",
                         )
-                    else:
-                        line1 = (
-                            f"{time_str} | {format_currents_line(currents)} | {total_current:6.3f} "
-                            f"| {voltage:6.3f} |   ---"
+
+                    # every field is a number or an ISO timestamp, so no CSV quoting is needed;
+                    # readings go through str() and lines end in \r\n as with csv.writer, while
+                    # elapsed_s always has two decimals ("0.10", not "0.1"). ASCII only, so
+                    # encoding is a plain copy
+                    now_s = int(wall_time())
+                    if now_s != ts_second:
+                        ts_second = now_s
+                        timestamp_str = datetime.fromtimestamp(now_s).isoformat(timespec="seconds")
+                    row_buf[0] = timestamp_str
+                    row_buf[1] = f"{elapsed:.2f}"  # one C-level format step instead of str(round(elapsed, 2))
+                    row_buf[ROW_I] = currents
+                    row_buf[ROW_I_SUM] = total_current
+                    row_buf[ROW_U_TERM] = voltage
+                    row_buf[ROW_U_DM] = dm_voltage if dm_voltage is not None else ""
+                    row_buf[ROW_T1] = temps1
+                    row_buf[ROW_T2] = temps2
+                    line = ",".join(map(str, row_buf))
+                    pending_rows.append((line + row_end).encode())
+                    last_line = line
+                    if len(pending_rows) >= flush_rows or stopped():
+                        if write_task is not None:
+                            # shielded: cancelling the loop must not abandon a batch mid-write
+                            await asyncio.shield(write_task)
+                        writing_rows = pending_rows
+                        write_task = asyncio.create_task(
+                            asyncio.to_thread(_write_rows, fd, writing_rows)
                         )
-                    print(line1)
-                    print(format_temperature_line("T1", temps1))
-                    print(format_temperature_line("T2", temps2))
-
-                    writer.writerow(
-                        [
-                            datetime.now().isoformat(timespec="seconds"),
-                            round(elapsed, 2),
-                            *currents,
-                            total_current,
-                            voltage,
-                            dm_voltage if dm_voltage is not None else "",
-                            *temps1,
-                            *temps2,
-                        ]
-                    )
+                        pending_rows = []
                 else:
+                    last_line = None
                     print("!! Failed to read one or more datapoints (1000, 1002, 6001, 6002)")
 
+                now = clock()
+                if interval > 0:
+                    work_dt = now - tick_start
+                    work_avg = work_dt if work_avg is None else work_avg + _EWMA_ALPHA * (work_dt - work_avg)
+                    if work_avg > _WIDEN_RATIO * interval:
+                        if effective_interval == interval:
+                            print(f"!! Ticks take {work_avg:.2f}s on average, widening the polling interval")
+                        effective_interval = max(interval, work_avg * _WIDEN_MARGIN)
+                    elif work_avg < _RELAX_RATIO * interval and effective_interval != interval:
+                        print(f"!! Ticks back to {work_avg:.2f}s, restoring the {interval}s polling interval")
+                        effective_interval = interval
+
                 iteration += 1
-                next_ts = start_time + (iteration * config.polling_interval)
-                await asyncio.sleep(max(0.0, next_ts - time.time()))
+                deadline += effective_interval
+                lag = now - deadline
+                if effective_interval > 0 and lag > effective_interval:
+                    # overran by more than a period: realign to the grid instead of rushing catch-up reads
+                    skipped = int(lag // effective_interval) + 1  # resume at the next grid point still ahead
+                    print(f"!! Measurement loop overran by {lag:.2f}s, skipping {skipped} sample(s)")
+                    if fill_skipped and last_line is not None:
+                        # keep the logged cadence regular: repeat this tick's sample at each skipped
+                        # grid point, flagged so analysis can tell it from a real reading
+                        fields = last_line.split(",", 2)[2]
+                        pending_rows.extend(
+                            f"{timestamp_str},{deadline + k * effective_interval - start_time:.2f},"
+                            f"{fields},1\r\n".encode()
+                            for k in range(skipped)
+                        )
+                    iteration += skipped
+                    deadline += skipped * effective_interval
+                await asyncio.sleep(max(0.0, deadline - clock()))
         finally:
+            if hioki_exec is not None:
+                # wait for an in-flight query so the caller can close the port safely, off the
+                # event loop so a query running into the serial timeout does not stall shutdown
+                await asyncio.to_thread(hioki_exec.shutdown, True)
+            if write_task is not None:
+                try:
+                    await write_task
+                except Exception as exc:
+                    # report the lost batch but still write and sync the rows collected since
+                    print(f"!! Failed to write {len(writing_rows)} log rows: {exc}")
+            _write_rows(fd, pending_rows)
+            # make the tail of the log durable even when the run ends with Ctrl+C
+            os.fsync(fd)
             print(f">> Log file saved: {log_path}")
 
     return MeasurementResult(log_path=log_path)
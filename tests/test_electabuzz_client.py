@@ -0,0 +1,22 @@
+"""Checks for the EbResult lookup tables in electabuzz_client."""
+import sys
+import unittest
+from pathlib import Path
+
+# the py/ modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "py"))
+
+import electabuzz_client as ebc  # noqa: E402
+
+
+class EbResultTablesTest(unittest.TestCase):
+    def test_tables_cover_every_eb_result(self):
+        for member in ebc.EbResult:
+            self.assertIs(ebc._EB_RESULT_BY_VALUE[member.value], member)
+            self.assertEqual(ebc._EB_NAME_BY_VALUE[member.value], member.name)
+        self.assertEqual(len(ebc._EB_RESULT_BY_VALUE), len(ebc.EbResult))
+        self.assertEqual(len(ebc._EB_NAME_BY_VALUE), len(ebc.EbResult))
+
+
+if __name__ == "__main__":
+    unittest.main()